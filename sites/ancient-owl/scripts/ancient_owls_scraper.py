@@ -1,3 +1,4 @@
+import asyncio
 import csv
 import hashlib
 import json
@@ -5,8 +6,51 @@ import os
 import time
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
+import httpx
+from aiolimiter import AsyncLimiter
+from selectolax.lexbor import LexborHTMLParser
+
+# orjson (C-backed) serializes/deserializes several times faster than the
+# stdlib json module. Fall back to stdlib so the script still runs without it.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Set a User-Agent to mimic a real browser visit
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Whether Pushover credentials are configured. Checked once at import so the
+# no-notify path (e.g. local dev) never bothers formatting a message body.
+NOTIFY_ENABLED = bool(os.getenv('APP_TOKEN') and os.getenv('USER_TOKEN'))
+
+# Politeness rate limit: at most this many requests started per second.
+# Unlike a fixed sleep, the limiter only waits when we're actually over the
+# rate, and parsing overlaps with the wait for the next request slot.
+REQUESTS_PER_SECOND = 2
+
+# The category links in the navigation almost never change, so cache them for
+# a day and skip the homepage fetch + parse on most runs. Delete the '_meta'
+# key from product_database.json to force a refresh.
+CATEGORY_CACHE_TTL_SECONDS = 86400
+
+# A single shared client so every request to the same host reuses one pooled
+# connection instead of paying a fresh handshake per call. http2=True lets
+# the Shopify host multiplex requests over a single TCP+TLS connection; the
+# transport retries connection errors a few times before giving up.
+SESSION = httpx.Client(
+    http2=True,
+    headers={'User-Agent': USER_AGENT},
+    timeout=10,
+    transport=httpx.HTTPTransport(http2=True, retries=3),
+)
+
+# Connection pool settings for the async client used during a scrape pass.
+# The client itself has to be created inside the pass: each asyncio.run call
+# spins up a fresh event loop, and pooled connections are bound to the loop
+# they were opened on, so a client shared across passes would fail once the
+# first loop is closed.
+ASYNC_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=10)
 
 
 def get_category_links(url):
@@ -14,97 +58,152 @@ def get_category_links(url):
     Scrapes the main navigation menu to find links to product categories.
     """
     print(f"Fetching main page to find category links: {url}")
-    # Set a User-Agent to mimic a real browser visit
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = SESSION.get(url)
         # Raise an exception for bad status codes (e.g., 404, 500)
         response.raise_for_status()
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error fetching URL {url}: {e}")
         return []
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+    tree = LexborHTMLParser(response.content)
 
     category_links = []
     # This CSS selector finds all <a> tags that are direct children of <li> tags,
     # which are themselves inside a <ul> with the id 'nav'.
     # This is a very precise way to get the main navigation links.
-    link_elements = soup.select('ul#nav > li > a')
+    link_elements = tree.css('ul#nav > li > a')
 
     # Interested in the first two links specifically
     # which are 'Products' and 'Crystals'. We can grab all relevant ones.
     for link_tag in link_elements:
         # We only want links that point to collections
-        href = link_tag.get('href')
+        href = link_tag.attributes.get('href')
         if href and '/collections/' in href:
             full_url = urljoin(url, href)
             category_links.append({
-                'name': link_tag.get_text(strip=True),
+                'name': link_tag.text(strip=True),
                 'url': full_url
             })
 
     return category_links
 
 
-def scrape_products_from_category(category_url):
+async def scrape_products_from_category(client, category_url, limiter, http_cache):
     """
     Scrapes all products from a given category page.
     Handles product name, price, URL, and sold-out status.
-    """
-    # Set a User-Agent to mimic a real browser visit
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
 
-    try:
-        response = requests.get(category_url, headers=headers, timeout=10)
-        # Raise an exception for bad status codes (e.g., 404, 500)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching URL {category_url}: {e}")
-        return []
-
-    soup = BeautifulSoup(response.content, 'html.parser')
+    Sends a conditional GET using the ETag/Last-Modified validators saved on
+    the previous run; if the server answers 304 Not Modified, the cached
+    products are returned without downloading or re-parsing the page.
+    """
+    cached = http_cache.get(category_url, {})
+    conditional_headers = {}
+    if cached.get('etag'):
+        conditional_headers['If-None-Match'] = cached['etag']
+    if cached.get('last_modified'):
+        conditional_headers['If-Modified-Since'] = cached['last_modified']
+
+    # The limiter caps the request start rate, which is kinder to the server
+    # than hammering every category simultaneously. Parsing happens outside
+    # the limited block so it overlaps with the next request's wait.
+    async with limiter:
+        try:
+            response = await client.get(category_url, headers=conditional_headers)
+            if response.status_code == 304:
+                print(f"Unchanged since last run (304), using cached products: {category_url}")
+                return cached.get('products', [])
+            # Raise an exception for bad status codes (e.g., 404, 500)
+            response.raise_for_status()
+            content = response.content
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+        except httpx.HTTPError as e:
+            print(f"Error fetching URL {category_url}: {e}")
+            return []
+
+    # selectolax keeps the parsed tree in C and only wraps the handful of
+    # nodes we actually touch, so parsing the whole page is cheap
+    tree = LexborHTMLParser(content)
 
     products_data = []
-    # Find the list containing all the products
-    product_list = soup.find('ul', id='product-loop')
-    if not product_list:
+    if tree.css_first('ul#product-loop') is None:
         print(f"Warning: Could not find product list on {category_url}")
         return []
 
     # Find all list items with the class 'product' inside that list
-    product_items = product_list.find_all('li', class_='product')
+    product_items = tree.css('ul#product-loop li.product')
+
+    # The category slug is the same for every product on the page, so compute
+    # it once here instead of splitting the URL on every iteration
+    category_slug = category_url.rstrip('/').rsplit('/', 1)[-1]
 
     for item in product_items:
-        name_tag = item.find('h3')
-        name = name_tag.get_text(strip=True) if name_tag else 'N/A'
+        name_tag = item.css_first('h3')
+        name = name_tag.text(strip=True) if name_tag else 'N/A'
 
-        link_tag = item.find('a')
-        product_url = urljoin(category_url, link_tag['href']) if link_tag and link_tag.has_attr('href') else 'N/A'
+        link_tag = item.css_first('a')
+        href = link_tag.attributes.get('href') if link_tag else None
+        product_url = urljoin(category_url, href) if href else 'N/A'
 
-        price_tag = item.find('div', class_='price')
+        price_tag = item.css_first('div.price')
         # Clean up price text, which can be complex (e.g., "From $40.00 - $45.00")
-        price = ' '.join(price_tag.get_text(separator=" ", strip=True).split()) if price_tag else 'N/A'
+        price = ' '.join(price_tag.text(separator=" ", strip=True).split()) if price_tag else 'N/A'
 
         # Check if the "Sold Out" div exists
-        is_sold_out = "Yes" if item.find('div', class_='so') else "No"
+        is_sold_out = "Yes" if item.css_first('div.so') else "No"
 
         products_data.append({
             'name': name,
             'price': price,
             'url': product_url,
             'sold_out': is_sold_out,
-            'category': category_url.split('/')[-1]  # Add category context
+            'category': category_slug  # Add category context
         })
 
+    # Remember the validators and the parsed products so the next run can
+    # send a conditional GET and skip the download entirely on a 304.
+    http_cache[category_url] = {
+        'etag': etag,
+        'last_modified': last_modified,
+        'products': products_data
+    }
+
     return products_data
 
 
+async def scrape_all_categories(categories):
+    """
+    Fetches every category page concurrently and returns the combined
+    product list. Category fetches are independent, so running them through
+    asyncio.gather overlaps their network latency instead of paying for
+    each round trip (plus a sleep) in sequence.
+    """
+    limiter = AsyncLimiter(REQUESTS_PER_SECOND, 1)
+    http_cache = load_http_cache()
+    # Entries are replaced (never mutated in place), so a shallow copy is
+    # enough to detect whether any of them changed this run
+    http_cache_before = dict(http_cache)
+
+    # With HTTP/2 every category fetch multiplexes over one TCP+TLS
+    # connection, so concurrent requests don't each pay a handshake
+    async with httpx.AsyncClient(http2=True, headers={'User-Agent': USER_AGENT},
+                                 timeout=15, limits=ASYNC_LIMITS) as client:
+        results = await asyncio.gather(
+            *(scrape_products_from_category(client, category['url'], limiter, http_cache)
+              for category in categories)
+        )
+
+    # Only rewrite the cache file when some page actually changed
+    if http_cache != http_cache_before:
+        save_http_cache(http_cache)
+
+    # Flatten the per-category lists into one combined list
+    return [product for page in results for product in page]
+
+
 def save_to_csv(data, filename='new_products.csv'):
     """
     Saves the scraped data to a CSV file.
@@ -123,27 +222,60 @@ def save_to_csv(data, filename='new_products.csv'):
     print(f"Data successfully saved to {filename}")
 
 
+def _load_json(filename):
+    """Reads a JSON file, using orjson when it's available."""
+    if orjson is not None:
+        with open(filename, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_json(obj, filename):
+    """Writes an indented JSON file, using orjson when it's available."""
+    if orjson is not None:
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, indent=2)
+
+
 def load_product_database(filename='product_database.json'):
     """Loads the product database from a JSON file."""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        return _load_json(filename)
+    # ValueError covers both json.JSONDecodeError and orjson.JSONDecodeError
+    except (FileNotFoundError, ValueError):
         return {}  # Return an empty dict if file doesn't exist or is empty/corrupt
 
 
 def save_product_database(database, filename='product_database.json'):
     """Saves the product database to a JSON file."""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(database, f, indent=2)
+    _save_json(database, filename)
     print(f"Updated product database saved to {filename}")
 
 
-def send_pushover_notification(title, products):
-    """Sends a formatted push notification using Pushover."""
-    import http.client
-    import urllib.parse
+def load_http_cache(filename='http_cache.json'):
+    """Loads per-URL HTTP validators and cached products from a JSON file."""
+    try:
+        return _load_json(filename)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_http_cache(cache, filename='http_cache.json'):
+    """Saves the HTTP cache to a JSON file."""
+    _save_json(cache, filename)
 
+
+def format_product_lines(products):
+    """Formats a list of products as one bullet line per product."""
+    return "\n".join(f"- {p['name']} ({p['price']})" for p in products)
+
+
+def send_pushover_notification(title, message_body):
+    """Sends a push notification with a pre-built message body using Pushover."""
     app_token = os.getenv('APP_TOKEN')
     user_token = os.getenv('USER_TOKEN')
 
@@ -152,26 +284,22 @@ def send_pushover_notification(title, products):
         print("Please set APP_TOKEN and USER_TOKEN secrets in your repository.")
         return
 
-    message_lines = [f"- {p['name']} ({p['price']})" for p in products]
-    message_body = "\n".join(message_lines)
-
     try:
-        conn = http.client.HTTPSConnection("api.pushover.net:443")
-        conn.request("POST", "/1/messages.json",
-                     urllib.parse.urlencode({
-                         "token": app_token,
-                         "user": user_token,
-                         "title": title,
-                         "message": message_body,
-                     }), {"Content-type": "application/x-www-form-urlencoded"})
-
-        response = conn.getresponse()
-        if 200 <= response.status < 300:
+        # Reuse the shared session so back-to-back notifications share one
+        # pooled connection instead of a fresh TLS handshake each.
+        response = SESSION.post('https://api.pushover.net/1/messages.json',
+                                data={
+                                    "token": app_token,
+                                    "user": user_token,
+                                    "title": title,
+                                    "message": message_body,
+                                })
+        if response.is_success:
             print("\nPushover notification sent successfully!")
         else:
-            print(f"\nFailed to send Pushover notification: {response.status} {response.reason}")
-            print(f"Response body: {response.read().decode()}")
-    except Exception as e:
+            print(f"\nFailed to send Pushover notification: {response.status_code} {response.reason_phrase}")
+            print(f"Response body: {response.text}")
+    except httpx.HTTPError as e:
         print(f"\nAn error occurred while sending Pushover notification: {e}")
 
 
@@ -184,8 +312,23 @@ def main():
 
     base_url = 'https://www.ancientowlnaturals.com/'
 
-    # Step 1: Get all the product category links from the main page.
-    categories = get_category_links(base_url)
+    # Load the database up front; its '_meta' entry holds the cached category
+    # links and is split off here so the product loops below never see it.
+    # db_on_disk is kept as-is so the save step can tell whether anything
+    # actually changed this run.
+    db_on_disk = load_product_database(PRODUCT_DATABASE_FILE)
+    meta = db_on_disk.get('_meta', {})
+    previous_db = {k: v for k, v in db_on_disk.items() if k != '_meta'}
+
+    # Step 1: Get all the product category links, from the cache if it's
+    # still fresh, otherwise from the main page.
+    now = time.time()
+    if meta.get('categories') and now - meta.get('categories_cached_at', 0) < CATEGORY_CACHE_TTL_SECONDS:
+        categories = meta['categories']
+        print("Using cached category links (refreshed daily).")
+    else:
+        categories = get_category_links(base_url)
+        meta = {'categories': categories, 'categories_cached_at': now}
 
     if not categories:
         print("Could not find any category links. Exiting.")
@@ -195,13 +338,9 @@ def main():
     for category in categories:
         print(f"- {category['name']}: {category['url']}")
 
-    # Step 2: Scrape all products from each category
-    all_products = []
-    for category in categories:
-        print(f"\n--- Scraping products from {category['name']} ---")
-        products_on_page = scrape_products_from_category(category['url'])
-        all_products.extend(products_on_page)
-        time.sleep(1)  # Be polite between requests
+    # Step 2: Scrape all products from every category concurrently
+    print(f"\n--- Scraping {len(categories)} categories concurrently ---")
+    all_products = asyncio.run(scrape_all_categories(categories))
 
     if not all_products:
         print("Scraping complete, but no products were found.")
@@ -209,16 +348,20 @@ def main():
         save_product_database({}, PRODUCT_DATABASE_FILE)
         return
 
-    # Step 3: Identify new and restocked products by comparing with the database
-    previous_db = load_product_database(PRODUCT_DATABASE_FILE)
+    # Step 3: Identify new and restocked products by comparing with the database.
+    # Build the full current state first, then diff the key sets with dict view
+    # operations, which run inside the C dict internals instead of doing a
+    # Python-level .get per product.
     current_db = {}
-    newly_found_products = []
-    restocked_products = []
+    products_by_hash = {}
 
     for product in all_products:
-        # A product's URL is a great unique identifier
-        product_hash = hashlib.sha256(product['url'].encode('utf-8')).hexdigest()
+        # A product's URL is a great unique identifier. This key doesn't need
+        # to be cryptographically strong, so a short blake2b digest is enough;
+        # it's faster than sha256 and halves the key size in the JSON file.
+        product_hash = hashlib.blake2b(product['url'].encode('utf-8'), digest_size=16).hexdigest()
 
+        products_by_hash[product_hash] = product
         # Add current product state to the new database for saving later
         current_db[product_hash] = {
             'name': product['name'],
@@ -226,33 +369,55 @@ def main():
             'sold_out': product['sold_out']
         }
 
-        previous_product_state = previous_db.get(product_hash)
+    # Keys we've never seen before are new products; keys present in both
+    # runs are restock candidates. Iterating current_db (insertion-ordered)
+    # keeps the reported products in scrape order.
+    new_keys = current_db.keys() - previous_db.keys()
+    common_keys = current_db.keys() & previous_db.keys()
 
-        if not previous_product_state:
-            # New product
-            newly_found_products.append(product)
-        else:
-            # Existing product, check for restock
-            if previous_product_state.get('sold_out') == "Yes" and product.get('sold_out') == "No":
-                restocked_products.append(product)
+    newly_found_products = [products_by_hash[k] for k in current_db if k in new_keys]
+    restocked_products = [
+        products_by_hash[k] for k in current_db
+        if k in common_keys
+        and previous_db[k].get('sold_out') == "Yes"
+        and current_db[k]['sold_out'] == "No"
+    ]
+
+    # Step 4: Report, notify, and save. Both event types go out in a single
+    # Pushover call so a run with news and restocks costs one POST, not two.
+    title_parts = []
 
-    # Step 4: Report, notify, and save
     if newly_found_products:
         print(f"\nFound {len(newly_found_products)} new product(s)!")
         save_to_csv(newly_found_products, filename=NEW_PRODUCTS_FILE)
-        title = f"Scraper: Found {len(newly_found_products)} New Product(s)!"
-        send_pushover_notification(title, newly_found_products)
+        title_parts.append(f"{len(newly_found_products)} New")
 
     if restocked_products:
         print(f"\nFound {len(restocked_products)} restocked product(s)!")
-        title = f"Scraper: {len(restocked_products)} Product(s) Back in Stock!"
-        send_pushover_notification(title, restocked_products)
+        title_parts.append(f"{len(restocked_products)} Restocked")
 
-    if not newly_found_products and not restocked_products:
+    if not title_parts:
         print("\nScraping complete. No new or restocked products found since the last run.")
+    elif NOTIFY_ENABLED:
+        # Only format the message body when a notification will actually go out
+        message_sections = []
+        if newly_found_products:
+            message_sections.append("NEW:\n" + format_product_lines(newly_found_products))
+        if restocked_products:
+            message_sections.append("RESTOCKED:\n" + format_product_lines(restocked_products))
+        title = f"Scraper: {' & '.join(title_parts)} Product(s)!"
+        send_pushover_notification(title, "\n\n".join(message_sections))
+    else:
+        print("\nPushover credentials not set. Skipping notification.")
 
-    # Save the current state of all found products as the new database
-    save_product_database(current_db, PRODUCT_DATABASE_FILE)
+    # Save the current state of all found products as the new database,
+    # carrying the category cache along in '_meta'. On the common run where
+    # nothing changed, skip the rewrite entirely.
+    current_db['_meta'] = meta
+    if current_db == db_on_disk:
+        print("Product database unchanged; skipping rewrite.")
+    else:
+        save_product_database(current_db, PRODUCT_DATABASE_FILE)
 
 
 if __name__ == '__main__':
@@ -1,12 +1,41 @@
-import http.client
+import json
 import os
-import urllib.parse
 from datetime import datetime
 
-import requests
-from bs4 import BeautifulSoup
+import httpx
+from selectolax.lexbor import LexborHTMLParser
 
 LOG_FILE = 'zyn_stock_log.txt'
+HTTP_CACHE_FILE = 'zyn_http_cache.json'
+
+# A single shared HTTP/2-capable client so repeated checks reuse one pooled
+# connection (and retry connection errors) instead of handshaking every time.
+SESSION = httpx.Client(
+    http2=True,
+    headers={
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    },
+    timeout=15,
+    transport=httpx.HTTPTransport(http2=True, retries=3),
+)
+
+
+def load_http_cache(filename=HTTP_CACHE_FILE):
+    """Loads the saved ETag/Last-Modified validators from the last run."""
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_http_cache(cache, filename=HTTP_CACHE_FILE):
+    """Saves the HTTP validators for the next run's conditional request."""
+    try:
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+    except Exception as e:
+        print(f"❌ Failed to write HTTP cache file: {e}")
 
 
 def log_status(message):
@@ -20,38 +49,41 @@ def log_status(message):
 
 
 def send_pushover_notification(product_name, product_url):
-    """Sends a formatted push notification using Pushover when an item is in stock."""
+    """
+    Sends a formatted push notification using Pushover when an item is in
+    stock. Returns True if the notification was delivered.
+    """
     app_token = os.getenv('APP_TOKEN')
     user_token = os.getenv('USER_TOKEN')
 
     if not all([app_token, user_token]):
         print("\nPushover credentials not set. Skipping notification.")
         print("Please set APP_TOKEN and USER_TOKEN secrets in your repository.")
-        return
+        return False
 
     title = "ZYN Stock Alert: Item is Back in Stock!"
     message = f"'{product_name}' is now available for purchase!\n\nURL: {product_url}"
 
     try:
-        conn = http.client.HTTPSConnection("api.pushover.net:443")
-        conn.request("POST", "/1/messages.json",
-                     urllib.parse.urlencode({
-                         "token": app_token,
-                         "user": user_token,
-                         "title": title,
-                         "message": message,
-                         "url": product_url,
-                         "url_title": "View Product Page"
-                     }), {"Content-type": "application/x-www-form-urlencoded"})
-
-        response = conn.getresponse()
-        if 200 <= response.status < 300:
+        # Reuse the shared session so the notification rides the existing
+        # connection pool instead of opening a fresh TLS connection.
+        response = SESSION.post('https://api.pushover.net/1/messages.json',
+                                data={
+                                    "token": app_token,
+                                    "user": user_token,
+                                    "title": title,
+                                    "message": message,
+                                    "url": product_url,
+                                    "url_title": "View Product Page"
+                                }, timeout=10)
+        if response.is_success:
             print("\n✅ Pushover notification sent successfully!")
-        else:
-            print(f"\n❌ Failed to send Pushover notification: {response.status} {response.reason}")
-            print(f"Response body: {response.read().decode()}")
-    except Exception as e:
+            return True
+        print(f"\n❌ Failed to send Pushover notification: {response.status_code} {response.reason_phrase}")
+        print(f"Response body: {response.text}")
+    except httpx.HTTPError as e:
         print(f"\n❌ An error occurred while sending Pushover notification: {e}")
+    return False
 
 
 def check_zyn_stock():
@@ -61,26 +93,49 @@ def check_zyn_stock():
     product_url = "https://us.zyn.com/ZYNRewardsStore/cuisinart-compact-bullet-ice-maker/"
     print(f"Checking stock for: {product_url}")
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    # Send a conditional GET with the validators from the previous run; a
+    # 304 means the page (and therefore the stock status) hasn't changed.
+    http_cache = load_http_cache()
+    cached = http_cache.get(product_url, {})
+    conditional_headers = {}
+    if cached.get('etag'):
+        conditional_headers['If-None-Match'] = cached['etag']
+    if cached.get('last_modified'):
+        conditional_headers['If-Modified-Since'] = cached['last_modified']
 
     try:
-        response = requests.get(product_url, headers=headers, timeout=15)
+        response = SESSION.get(product_url, headers=conditional_headers)
+        if response.status_code == 304:
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')
+            status_message = f"[{timestamp}] NOT MODIFIED: Page unchanged since last check."
+            print(status_message)
+            log_status(status_message)
+            return
         response.raise_for_status()
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error fetching URL {product_url}: {e}")
         return
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+    # Don't persist these yet: a saved validator means the next run 304s and
+    # returns early, so it must only be written once this run has finished
+    # handling the page (including getting any in-stock alert out the door).
+    new_validators = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified')
+    }
+
+    tree = LexborHTMLParser(response.content)
 
     # Find the "Add to Cart" button. Its disabled status is the most reliable indicator.
-    add_to_cart_button = soup.find('button', {'x-ref': 'submitButton'})
+    add_to_cart_button = tree.css_first('button[x-ref="submitButton"]')
 
     # Find the first h1 tag that does NOT contain the generic welcome message.
-    # This is more robust than the previous loop.
-    name_tag = soup.find(lambda tag: tag.name == 'h1' and 'Welcome to ZYN.com' not in tag.get_text())
-    product_name = name_tag.get_text(strip=True) if name_tag else "Cuisinart Compact Bullet Ice Maker"
+    product_name = "Cuisinart Compact Bullet Ice Maker"
+    for h1 in tree.css('h1'):
+        name = h1.text(strip=True)
+        if 'Welcome to ZYN.com' not in name:
+            product_name = name
+            break
 
     if not add_to_cart_button:
         print("Could not find the 'Add to Cart' button. The page structure may have changed.")
@@ -88,15 +143,24 @@ def check_zyn_stock():
 
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')
     # The 'disabled' attribute is present if the item is out of stock.
-    if 'disabled' in add_to_cart_button.attrs:
+    if 'disabled' in add_to_cart_button.attributes:
         status_message = f"[{timestamp}] OUT OF STOCK: Item '{product_name}' is not available."
         print(status_message)
         log_status(status_message)
+        notified = True  # Nothing to notify, so the run is complete
     else:
         status_message = f"[{timestamp}] ✅ IN STOCK: Item '{product_name}' is available!"
         print(status_message)
         log_status(status_message)
-        send_pushover_notification(product_name, product_url)
+        notified = send_pushover_notification(product_name, product_url)
+
+    # Only remember the validators once the run fully succeeded. If the
+    # in-stock alert failed (or credentials were missing), leaving the old
+    # validators in place forces the next run to re-fetch and retry instead
+    # of short-circuiting on a 304 and silently dropping the alert.
+    if notified:
+        http_cache[product_url] = new_validators
+        save_http_cache(http_cache)
 
 
 if __name__ == '__main__':